@@ -1,4 +1,6 @@
+import asyncio
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 from telegram import Update
 from telegram.ext import (
@@ -11,24 +13,26 @@ from telegram.ext import (
 
 from config import TELEGRAM_BOT_TOKEN
 from src.database import (
+    close_db,
     delete_quote,
-    export_all_quotes,
+    get_favorite_count,
     get_favorite_quotes,
     get_last_quotes,
     get_quote_by_id,
     get_quote_count,
     get_quotes_by_source,
     get_quotes_by_tag,
-    get_quotes_this_week,
     get_random_quotes,
     get_top_tags,
+    get_user_stats,
     is_duplicate,
     register_user,
     save_quote,
     search_quotes,
+    stream_quotes_json,
     toggle_favorite,
 )
-from src.metadata import fetch_metadata
+from src.metadata import fetch_metadata_cached
 from src.parser import parse_message
 
 # How long to remember a pending URL (in minutes)
@@ -87,10 +91,13 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = await ensure_registered(update)
 
-    total = await get_quote_count(user_id)
-    this_week = await get_quotes_this_week(user_id)
-    favorites = len(await get_favorite_quotes(user_id))
-    top_tags = await get_top_tags(user_id, 5)
+    stats, top_tags = await asyncio.gather(
+        get_user_stats(user_id),
+        get_top_tags(user_id, 5),
+    )
+    total = stats["total"]
+    this_week = stats["this_week"]
+    favorites = stats["favorites"]
 
     tags_text = ""
     if top_tags:
@@ -134,11 +141,10 @@ async def last_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("No quotes saved yet.")
         return
 
-    response = f"Last {len(quotes)} quote(s):\n\n"
-    for quote in quotes:
-        response += f"{format_quote(quote, show_id=True)}\n\n"
+    parts = [f"Last {len(quotes)} quote(s):"]
+    parts.extend(format_quote(quote, show_id=True) for quote in quotes)
 
-    await update.message.reply_text(response[:4000])
+    await update.message.reply_text("\n\n".join(parts)[:4000])
 
 
 async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -155,11 +161,10 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f'No quotes found containing "{keyword}"')
         return
 
-    response = f'Found {len(quotes)} quote(s) for "{keyword}":\n\n'
-    for quote in quotes[:5]:
-        response += f"{format_quote(quote, show_id=True)}\n\n"
+    parts = [f'Found {len(quotes)} quote(s) for "{keyword}":']
+    parts.extend(format_quote(quote, show_id=True) for quote in quotes[:5])
 
-    await update.message.reply_text(response[:4000])
+    await update.message.reply_text("\n\n".join(parts)[:4000])
 
 
 async def tag_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -176,11 +181,10 @@ async def tag_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f'No quotes found with tag #{tag}')
         return
 
-    response = f'Found {len(quotes)} quote(s) with #{tag}:\n\n'
-    for quote in quotes[:5]:
-        response += f"{format_quote(quote, show_id=True)}\n\n"
+    parts = [f'Found {len(quotes)} quote(s) with #{tag}:']
+    parts.extend(format_quote(quote, show_id=True) for quote in quotes[:5])
 
-    await update.message.reply_text(response[:4000])
+    await update.message.reply_text("\n\n".join(parts)[:4000])
 
 
 async def source_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -197,11 +201,10 @@ async def source_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f'No quotes found from {domain}')
         return
 
-    response = f'Found {len(quotes)} quote(s) from {domain}:\n\n'
-    for quote in quotes[:5]:
-        response += f"{format_quote(quote, show_id=True)}\n\n"
+    parts = [f'Found {len(quotes)} quote(s) from {domain}:']
+    parts.extend(format_quote(quote, show_id=True) for quote in quotes[:5])
 
-    await update.message.reply_text(response[:4000])
+    await update.message.reply_text("\n\n".join(parts)[:4000])
 
 
 async def fav_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -229,19 +232,21 @@ async def fav_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def favorites_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = await ensure_registered(update)
 
-    quotes = await get_favorite_quotes(user_id)
+    count, quotes = await asyncio.gather(
+        get_favorite_count(user_id),
+        get_favorite_quotes(user_id, limit=10),
+    )
     if not quotes:
         await update.message.reply_text("No favorite quotes yet. Use /fav <id> to add some!")
         return
 
-    response = f"Your {len(quotes)} favorite quote(s):\n\n"
-    for quote in quotes[:10]:
-        response += f"{format_quote(quote, show_id=True)}\n\n"
+    parts = [f"Your {count} favorite quote(s):"]
+    parts.extend(format_quote(quote, show_id=True) for quote in quotes)
 
-    if len(quotes) > 10:
-        response += f"... and {len(quotes) - 10} more"
+    if count > 10:
+        parts.append(f"... and {count - 10} more")
 
-    await update.message.reply_text(response[:4000])
+    await update.message.reply_text("\n\n".join(parts)[:4000])
 
 
 async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -274,20 +279,23 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = await ensure_registered(update)
 
-    json_data = await export_all_quotes(user_id)
     count = await get_quote_count(user_id)
-
     if count == 0:
         await update.message.reply_text("No quotes to export.")
         return
 
-    # Send as a document
-    from io import BytesIO
-    file = BytesIO(json_data.encode())
-    file.name = "readwiser_quotes.json"
+    # Stream the export into a spooled file so big collections never sit
+    # in memory as one giant string (spills to disk past 1 MiB)
+    from tempfile import SpooledTemporaryFile
+
+    buffer = SpooledTemporaryFile(max_size=1 << 20)
+    async for chunk in stream_quotes_json(user_id):
+        buffer.write(chunk)
+    buffer.seek(0)
 
     await update.message.reply_document(
-        document=file,
+        document=buffer,
+        filename="readwiser_quotes.json",
         caption=f"Exported {count} quotes"
     )
 
@@ -352,7 +360,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if is_url_only:
         # Store URL and ask for quote
-        metadata = await fetch_metadata(parsed.url)
+        metadata = await fetch_metadata_cached(parsed.url)
         set_pending_url(context, parsed.url, {
             "title": metadata.title,
             "author": metadata.author,
@@ -381,31 +389,46 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Check for duplicates
-    if await is_duplicate(user_id, parsed.quote):
+    url = parsed.url
+    pending = get_pending_url(context)
+    needs_fetch = url and not (pending and pending[0] == url)
+
+    # Check for duplicates; when a fresh URL needs fetching, the duplicate
+    # check and the metadata fetch are independent, so overlap the HTTP
+    # wait with the database query instead of paying for them in sequence.
+    metadata = None
+    if needs_fetch:
+        duplicate, metadata = await asyncio.gather(
+            is_duplicate(user_id, parsed.quote),
+            fetch_metadata_cached(url),
+        )
+    else:
+        duplicate = await is_duplicate(user_id, parsed.quote)
+
+    if duplicate:
         await update.message.reply_text("This quote was already saved recently.")
         return
 
-    # Check for pending URL if no URL in current message
-    url = parsed.url
     title, author, domain = None, None, None
 
     if url:
-        # URL provided in this message - fetch fresh metadata
-        metadata = await fetch_metadata(url)
-        title = metadata.title
-        author = metadata.author
-        domain = metadata.domain
+        if metadata is not None:
+            title = metadata.title
+            author = metadata.author
+            domain = metadata.domain
+        else:
+            # Same link we already fetched - reuse the pending metadata
+            stored = pending[1]
+            title = stored.get("title")
+            author = stored.get("author")
+            domain = stored.get("domain")
         clear_pending_url(context)  # Clear any pending URL
-    else:
-        # Check for pending URL
-        pending = get_pending_url(context)
-        if pending:
-            url, metadata = pending
-            title = metadata.get("title")
-            author = metadata.get("author")
-            domain = metadata.get("domain")
-            clear_pending_url(context)
+    elif pending:
+        url, stored = pending
+        title = stored.get("title")
+        author = stored.get("author")
+        domain = stored.get("domain")
+        clear_pending_url(context)
 
     # Save to database
     quote_id = await save_quote(
@@ -469,36 +492,70 @@ def format_relative_time(timestamp_str: str) -> str:
         return ""
 
 
-def format_quote(quote: dict, show_id: bool = False) -> str:
-    """Format a quote for display."""
-    prefix = f"[#{quote['id']}] " if show_id else ""
-    fav = " ⭐" if quote.get("is_favorite") else ""
-    text = f'{prefix}"{quote["text"]}"{fav}'
+@lru_cache(maxsize=4096)
+def _format_quote_body(
+    quote_id: int,
+    text: str,
+    url: str | None,
+    source_title: str | None,
+    source_author: str | None,
+    source_domain: str | None,
+    tags: str | None,
+    is_favorite: bool,
+    show_id: bool,
+) -> str:
+    """Build the static part of a quote's display string.
+
+    Every rendered field is part of the cache key, so an entry can never
+    go stale; rerunning /last or /favorites over the same quotes reuses
+    the already-built strings. The relative timestamp is appended by
+    format_quote since it changes as time passes.
+    """
+    prefix = f"[#{quote_id}] " if show_id else ""
+    fav = " ⭐" if is_favorite else ""
+    lines = [f'{prefix}"{text}"{fav}']
 
     source_parts = []
-    if quote.get("source_title"):
-        source_parts.append(quote["source_title"])
-    if quote.get("source_author"):
-        source_parts.append(f"by {quote['source_author']}")
-    elif quote.get("source_domain"):
-        source_parts.append(f"({quote['source_domain']})")
+    if source_title:
+        source_parts.append(source_title)
+    if source_author:
+        source_parts.append(f"by {source_author}")
+    elif source_domain:
+        source_parts.append(f"({source_domain})")
 
     if source_parts:
-        text += f"\n  -- {' '.join(source_parts)}"
+        lines.append(f"  -- {' '.join(source_parts)}")
+
+    if url:
+        lines.append(f"  {url}")
+
+    if tags:
+        lines.append(f"  {' '.join(f'#{t}' for t in tags.split(','))}")
+
+    return "\n".join(lines)
 
-    if quote.get("url"):
-        text += f"\n  {quote['url']}"
 
-    if quote.get("tags"):
-        text += f"\n  {' '.join(f'#{t}' for t in quote['tags'].split(','))}"
+def format_quote(quote: dict, show_id: bool = False) -> str:
+    """Format a quote for display."""
+    body = _format_quote_body(
+        quote["id"],
+        quote["text"],
+        quote.get("url"),
+        quote.get("source_title"),
+        quote.get("source_author"),
+        quote.get("source_domain"),
+        quote.get("tags"),
+        bool(quote.get("is_favorite")),
+        show_id,
+    )
 
     # Add timestamp
     if quote.get("created_at"):
         relative_time = format_relative_time(quote["created_at"])
         if relative_time:
-            text += f"\n  📅 Saved {relative_time}"
+            return f"{body}\n  📅 Saved {relative_time}"
 
-    return text
+    return body
 
 
 def truncate(text: str, length: int) -> str:
@@ -508,9 +565,24 @@ def truncate(text: str, length: int) -> str:
     return text[:length - 3] + "..."
 
 
+async def _post_shutdown(app: Application):
+    """Release shared resources when the bot shuts down."""
+    await close_db()
+
+
 def create_bot() -> Application:
     """Create and configure the Telegram bot."""
-    app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    app = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        # Broadcasts keep up to BROADCAST_CONCURRENCY sends in flight on
+        # this one bot; size the HTTPX pool above that so concurrent sends
+        # reuse warm connections instead of queuing on pool_timeout.
+        .connection_pool_size(64)
+        .pool_timeout(10.0)
+        .post_shutdown(_post_shutdown)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("help", help_command))
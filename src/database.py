@@ -1,11 +1,13 @@
-import json
+import hashlib
 import logging
+import time
 from collections.abc import Callable
 from datetime import datetime, timedelta
 from functools import wraps
 from typing import ParamSpec, TypeVar
 
 import aiosqlite
+import orjson
 from config import DATABASE_PATH, DATA_DIR
 
 logger = logging.getLogger(__name__)
@@ -13,6 +15,28 @@ logger = logging.getLogger(__name__)
 P = ParamSpec('P')
 T = TypeVar('T')
 
+# Shared connection, opened lazily by get_db() and reused for the process
+# lifetime. Opening a connection per call costs a file open + page-cache
+# warmup on every query, which dominates latency for our short queries.
+_db: aiosqlite.Connection | None = None
+
+# /stats answers rarely change between adjacent calls, so cache them
+# briefly per user; writes invalidate the entry
+STATS_CACHE_TTL = 30  # seconds
+_stats_cache: dict[int, tuple[float, dict]] = {}
+
+
+def _invalidate_stats(user_id: int):
+    """Drop the cached stats for a user after their quotes change."""
+    _stats_cache.pop(user_id, None)
+
+
+# Recently-seen users: chat_id -> (username, first_name). Every handler
+# calls register_user first, so this lets the 99% case of an already-
+# registered user with an unchanged profile skip the database entirely.
+SEEN_USERS_MAX = 1024
+_seen_users: dict[int, tuple] = {}
+
 
 class DatabaseError(Exception):
     """Custom exception for database operations."""
@@ -34,88 +58,253 @@ def handle_db_errors(func: Callable[P, T]) -> Callable[P, T]:
     return wrapper
 
 
-async def _get_connection():
-    """Get a database connection with foreign keys enabled."""
-    db = await aiosqlite.connect(DATABASE_PATH)
-    await db.execute("PRAGMA foreign_keys = ON")
-    return db
+async def get_db() -> aiosqlite.Connection:
+    """Get the shared database connection, opening it on first use.
+
+    The connection runs in autocommit mode (isolation_level=None), so writes
+    are durable without explicit commit() round-trips. PRAGMAs are applied
+    once here instead of once per query.
+    """
+    global _db
+    if _db is None:
+        # cached_statements keeps compiled statements for reuse: repeat
+        # executions of the same SQL text skip SQLite's parser/planner.
+        # The default of 128 is tight once the per-user queries are counted,
+        # so give the cache enough headroom to hold every hot statement.
+        _db = await aiosqlite.connect(
+            DATABASE_PATH, isolation_level=None, cached_statements=256
+        )
+        _db.row_factory = aiosqlite.Row
+        await _db.execute("PRAGMA foreign_keys = ON")
+        await _db.execute("PRAGMA journal_mode = WAL")
+        await _db.execute("PRAGMA synchronous = NORMAL")
+        await _db.execute("PRAGMA temp_store = MEMORY")
+        await _db.execute("PRAGMA mmap_size = 268435456")
+        await _db.execute("PRAGMA cache_size = -20000")
+        logger.debug("Opened shared database connection")
+    return _db
+
+
+async def close_db():
+    """Close the shared database connection if it is open."""
+    global _db
+    if _db is not None:
+        await _db.close()
+        _db = None
+        logger.debug("Closed shared database connection")
+
+
+# Columns added to the quotes table after the initial release; applied as
+# ALTERs when an existing database predates them
+_QUOTE_MIGRATIONS = [
+    ("is_favorite", "INTEGER DEFAULT 0"),
+    ("times_shown", "INTEGER DEFAULT 0"),
+    ("last_shown", "TIMESTAMP"),
+    ("user_id", "INTEGER DEFAULT 0"),
+    ("text_hash", "TEXT"),
+]
+
+# Same, for the users table
+_USER_MIGRATIONS = [
+    ("quote_count", "INTEGER DEFAULT 0"),
+]
+
+# Full schema: tables, indexes, the FTS search table with its sync
+# triggers, and the normalized tag tables. Every statement is IF NOT
+# EXISTS so the script is idempotent on restart.
+_SCHEMA_SCRIPT = """
+    -- Users table - tracks all users for sending digests
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER UNIQUE NOT NULL,
+        username TEXT,
+        first_name TEXT,
+        digest_enabled INTEGER DEFAULT 1,
+        daily_quote_enabled INTEGER DEFAULT 1,
+        quote_count INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS quotes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        url TEXT,
+        source_title TEXT,
+        source_author TEXT,
+        source_domain TEXT,
+        tags TEXT,
+        text_hash TEXT,
+        is_favorite INTEGER DEFAULT 0,
+        times_shown INTEGER DEFAULT 0,
+        last_shown TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (chat_id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_quotes_user_id ON quotes(user_id);
+    CREATE INDEX IF NOT EXISTS idx_quotes_created_at ON quotes(created_at);
+    CREATE INDEX IF NOT EXISTS idx_users_chat_id ON users(chat_id);
+
+    -- Composite indexes matching how the read queries actually filter:
+    -- everything is scoped by user_id, then ordered by created_at or
+    -- narrowed by is_favorite / source_domain / the spaced-repetition sort
+    CREATE INDEX IF NOT EXISTS idx_quotes_user_created
+        ON quotes(user_id, created_at DESC);
+    CREATE INDEX IF NOT EXISTS idx_quotes_user_fav
+        ON quotes(user_id, is_favorite) WHERE is_favorite = 1;
+    CREATE INDEX IF NOT EXISTS idx_quotes_user_domain
+        ON quotes(user_id, source_domain);
+    CREATE INDEX IF NOT EXISTS idx_quotes_user_lastshown
+        ON quotes(user_id, last_shown, times_shown);
+    CREATE INDEX IF NOT EXISTS idx_quotes_user_hash
+        ON quotes(user_id, text_hash, created_at);
+
+    -- Partial indexes for the broadcast recipient lookups: only rows with
+    -- the flag set are indexed, so the scan touches exactly the recipients
+    CREATE INDEX IF NOT EXISTS idx_users_digest_enabled
+        ON users(digest_enabled) WHERE digest_enabled = 1;
+    CREATE INDEX IF NOT EXISTS idx_users_daily_quote_enabled
+        ON users(daily_quote_enabled) WHERE daily_quote_enabled = 1;
+
+    -- Full-text index over quote text and tags, kept in sync by triggers.
+    -- LIKE '%kw%' cannot use an index and scans every row per search.
+    CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts USING fts5(
+        text, tags,
+        content='quotes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_ai AFTER INSERT ON quotes BEGIN
+        INSERT INTO quotes_fts(rowid, text, tags) VALUES (new.id, new.text, new.tags);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_ad AFTER DELETE ON quotes BEGIN
+        INSERT INTO quotes_fts(quotes_fts, rowid, text, tags)
+        VALUES ('delete', old.id, old.text, old.tags);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS quotes_fts_au AFTER UPDATE OF text, tags ON quotes BEGIN
+        INSERT INTO quotes_fts(quotes_fts, rowid, text, tags)
+        VALUES ('delete', old.id, old.text, old.tags);
+        INSERT INTO quotes_fts(rowid, text, tags) VALUES (new.id, new.text, new.tags);
+    END;
+
+    -- Denormalized per-user quote counter so digest broadcasts read it
+    -- straight off the user row instead of re-aggregating quotes
+    CREATE TRIGGER IF NOT EXISTS quotes_count_ai AFTER INSERT ON quotes BEGIN
+        UPDATE users SET quote_count = quote_count + 1 WHERE chat_id = new.user_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS quotes_count_ad AFTER DELETE ON quotes BEGIN
+        UPDATE users SET quote_count = quote_count - 1 WHERE chat_id = old.user_id;
+    END;
+
+    -- Normalized tag tables so tag lookups are index seeks instead of
+    -- LIKE scans over the comma-joined tags column
+    CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL COLLATE NOCASE
+    );
+
+    CREATE TABLE IF NOT EXISTS quote_tags (
+        quote_id INTEGER NOT NULL,
+        tag_id INTEGER NOT NULL,
+        PRIMARY KEY (quote_id, tag_id),
+        FOREIGN KEY (quote_id) REFERENCES quotes (id) ON DELETE CASCADE,
+        FOREIGN KEY (tag_id) REFERENCES tags (id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_quote_tags_tag ON quote_tags(tag_id, quote_id);
+"""
 
 
 @handle_db_errors
 async def init_db():
-    """Initialize the database with required tables."""
+    """Initialize the database schema in a single transaction."""
     try:
         DATA_DIR.mkdir(exist_ok=True)
     except OSError as e:
         logger.error(f"Failed to create data directory {DATA_DIR}: {e}")
         raise DatabaseError(f"Cannot create data directory: {e}") from e
 
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        # Enable foreign keys
-        await db.execute("PRAGMA foreign_keys = ON")
-
-        # Users table - tracks all users for sending digests
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY,
-                chat_id INTEGER UNIQUE NOT NULL,
-                username TEXT,
-                first_name TEXT,
-                digest_enabled INTEGER DEFAULT 1,
-                daily_quote_enabled INTEGER DEFAULT 1,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        # Quotes table - now with user_id
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS quotes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                text TEXT NOT NULL,
-                url TEXT,
-                source_title TEXT,
-                source_author TEXT,
-                source_domain TEXT,
-                tags TEXT,
-                is_favorite INTEGER DEFAULT 0,
-                times_shown INTEGER DEFAULT 0,
-                last_shown TIMESTAMP,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (chat_id)
-            )
-        """)
+    db = await get_db()
 
-        # Create indexes for common queries
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_quotes_user_id ON quotes(user_id)")
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_quotes_created_at ON quotes(created_at)")
-        await db.execute("CREATE INDEX IF NOT EXISTS idx_users_chat_id ON users(chat_id)")
+    # Fresh database, fresh caches (also keeps tests isolated)
+    _stats_cache.clear()
+    _seen_users.clear()
 
-        await db.commit()
-        logger.info("Database initialized successfully")
+    # Discover the current schema up front so column migrations and
+    # first-run backfills can be decided before the script executes
+    cursor = await db.execute("PRAGMA table_info(quotes)")
+    quote_columns = {row[1] for row in await cursor.fetchall()}
+    cursor = await db.execute("PRAGMA table_info(users)")
+    user_columns = {row[1] for row in await cursor.fetchall()}
+    cursor = await db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing_tables = {row[0] for row in await cursor.fetchall()}
+
+    alters = []
+    if quote_columns:
+        for col_name, col_type in _QUOTE_MIGRATIONS:
+            if col_name not in quote_columns:
+                logger.info(f"Migrating database: adding column {col_name}")
+                alters.append(f"ALTER TABLE quotes ADD COLUMN {col_name} {col_type};")
+    if user_columns:
+        for col_name, col_type in _USER_MIGRATIONS:
+            if col_name not in user_columns:
+                logger.info(f"Migrating database: adding users column {col_name}")
+                alters.append(f"ALTER TABLE users ADD COLUMN {col_name} {col_type};")
+
+    # One transaction (and one fsync) for the whole setup instead of a
+    # commit per statement. Migrations run first so the indexes that
+    # reference the newer columns can be created.
+    script = "BEGIN;\n" + "\n".join(alters) + _SCHEMA_SCRIPT + "\nCOMMIT;"
+    await db.executescript(script)
+
+    # First-run backfills for the derived tables
+    if "quotes_fts" not in existing_tables:
+        await db.execute("INSERT INTO quotes_fts(quotes_fts) VALUES ('rebuild')")
+        logger.info("Built full-text search index for existing quotes")
+    if "quote_tags" not in existing_tables:
+        await _backfill_tags(db)
+    if user_columns and "quote_count" not in user_columns:
+        await db.execute(
+            "UPDATE users SET quote_count = "
+            "(SELECT COUNT(*) FROM quotes WHERE quotes.user_id = users.chat_id)"
+        )
+        logger.info("Backfilled per-user quote counters")
 
-        # Migration: add new columns to existing databases
-        await _migrate_db(db)
+    # Refresh planner statistics so the new indexes actually get picked
+    await db.execute("ANALYZE")
 
+    logger.info("Database initialized successfully")
 
-async def _migrate_db(db):
-    """Add new columns if they don't exist (for existing databases)."""
-    cursor = await db.execute("PRAGMA table_info(quotes)")
-    columns = {row[1] for row in await cursor.fetchall()}
 
-    migrations = [
-        ("is_favorite", "INTEGER DEFAULT 0"),
-        ("times_shown", "INTEGER DEFAULT 0"),
-        ("last_shown", "TIMESTAMP"),
-        ("user_id", "INTEGER DEFAULT 0"),
-    ]
+async def _backfill_tags(db):
+    """Populate the tag tables from the comma-joined tags column."""
+    cursor = await db.execute(
+        "SELECT id, tags FROM quotes WHERE tags IS NOT NULL AND tags != ''"
+    )
+    rows = await cursor.fetchall()
+    for quote_id, tags_str in rows:
+        tag_names = [t.strip() for t in tags_str.split(",") if t.strip()]
+        if tag_names:
+            await _link_tags(db, quote_id, tag_names)
+    if rows:
+        logger.info(f"Backfilled tag tables for {len(rows)} quotes")
 
-    for col_name, col_type in migrations:
-        if col_name not in columns:
-            logger.info(f"Migrating database: adding column {col_name}")
-            await db.execute(f"ALTER TABLE quotes ADD COLUMN {col_name} {col_type}")
 
-    await db.commit()
+async def _link_tags(db, quote_id: int, tags: list):
+    """Insert tags and their join rows for a quote."""
+    await db.executemany(
+        "INSERT OR IGNORE INTO tags (name) VALUES (?)",
+        [(tag,) for tag in tags]
+    )
+    await db.executemany(
+        "INSERT OR IGNORE INTO quote_tags (quote_id, tag_id) "
+        "SELECT ?, id FROM tags WHERE name = ?",
+        [(quote_id, tag) for tag in tags]
+    )
 
 
 # ============ User functions ============
@@ -123,61 +312,113 @@ async def _migrate_db(db):
 @handle_db_errors
 async def register_user(chat_id: int, username: str = None, first_name: str = None) -> bool:
     """Register a new user or update existing. Returns True if new user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute("PRAGMA foreign_keys = ON")
-        cursor = await db.execute("SELECT chat_id FROM users WHERE chat_id = ?", (chat_id,))
-        exists = await cursor.fetchone()
-
-        if exists:
-            await db.execute(
-                "UPDATE users SET username = ?, first_name = ? WHERE chat_id = ?",
-                (username, first_name, chat_id)
-            )
-            await db.commit()
-            logger.debug(f"Updated user {chat_id}")
-            return False
-        else:
-            await db.execute(
-                "INSERT INTO users (chat_id, username, first_name) VALUES (?, ?, ?)",
-                (chat_id, username, first_name)
-            )
-            await db.commit()
-            logger.info(f"Registered new user {chat_id} ({username})")
-            return True
+    snapshot = (username, first_name)
+    if _seen_users.get(chat_id) == snapshot:
+        return False
+
+    db = await get_db()
+    cursor = await db.execute(
+        "INSERT OR IGNORE INTO users (chat_id, username, first_name) VALUES (?, ?, ?)",
+        (chat_id, username, first_name)
+    )
+    is_new = cursor.rowcount > 0
+
+    if is_new:
+        logger.info(f"Registered new user {chat_id} ({username})")
+    else:
+        # Existing user with an unseen (possibly changed) profile
+        await db.execute(
+            "UPDATE users SET username = ?, first_name = ? WHERE chat_id = ?",
+            (username, first_name, chat_id)
+        )
+        logger.debug(f"Updated user {chat_id}")
+
+    while len(_seen_users) >= SEEN_USERS_MAX:
+        _seen_users.pop(next(iter(_seen_users)))
+    _seen_users[chat_id] = snapshot
+    return is_new
 
 
 @handle_db_errors
 async def get_all_users() -> list:
     """Get all registered users."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM users")
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    db = await get_db()
+    cursor = await db.execute("SELECT * FROM users")
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
 
 
 @handle_db_errors
 async def get_users_for_digest() -> list:
     """Get users who have digest enabled."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM users WHERE digest_enabled = 1")
+    db = await get_db()
+    cursor = await db.execute("SELECT * FROM users WHERE digest_enabled = 1")
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
+
+
+async def iter_users_for_digest(batch_size: int = 500):
+    """Yield digest-enabled users in id-ordered batches.
+
+    Keyset pagination (WHERE id > last seen) keeps every fetch an index
+    seek and peak memory at one batch, so a broadcast can start sending
+    while later batches are still being read.
+    """
+    db = await get_db()
+    last_id = 0
+    while True:
+        cursor = await db.execute(
+            "SELECT * FROM users WHERE digest_enabled = 1 AND id > ? "
+            "ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        )
         rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+        if not rows:
+            return
+        last_id = rows[-1]["id"]
+        yield [dict(row) for row in rows]
 
 
 @handle_db_errors
 async def get_users_for_daily_quote() -> list:
     """Get users who have daily quote enabled."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM users WHERE daily_quote_enabled = 1")
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    db = await get_db()
+    cursor = await db.execute("SELECT * FROM users WHERE daily_quote_enabled = 1")
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
 
 
 # ============ Quote functions ============
 
+# Columns format_quote actually renders. List readers select these
+# instead of * so times_shown/last_shown/user_id/text_hash aren't copied
+# through the driver for every row just to be thrown away.
+DISPLAY_COLS = (
+    "id, text, url, source_title, source_author, "
+    "source_domain, tags, is_favorite, created_at"
+)
+# Same columns qualified for joined queries
+_DISPLAY_COLS_Q = ", ".join(f"q.{col}" for col in DISPLAY_COLS.split(", "))
+
+# Digest/random picks cap the text in SQL so essay-length quotes never
+# cross the driver just to be cut down by the message length budget
+DIGEST_TEXT_LIMIT = 800
+
+# DISPLAY_COLS with text truncated to the digest budget, ellipsis-marked
+# only when something was actually cut
+_DIGEST_COLS = DISPLAY_COLS.replace(
+    "text",
+    f"CASE WHEN LENGTH(text) > {DIGEST_TEXT_LIMIT} "
+    f"THEN SUBSTR(text, 1, {DIGEST_TEXT_LIMIT}) || '...' ELSE text END AS text",
+    1,
+)
+
+
+def _text_hash(text: str) -> str:
+    """Hash quote text for the indexed duplicate check."""
+    return hashlib.blake2b(text.strip().encode(), digest_size=16).hexdigest()
+
+
 @handle_db_errors
 async def save_quote(user_id: int, text: str, url: str = None, title: str = None,
                      author: str = None, domain: str = None, tags: list = None) -> int:
@@ -186,45 +427,60 @@ async def save_quote(user_id: int, text: str, url: str = None, title: str = None
         raise ValueError("Quote text cannot be empty")
 
     tags_str = ",".join(tags) if tags else None
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute("PRAGMA foreign_keys = ON")
-        cursor = await db.execute(
-            """INSERT INTO quotes (user_id, text, url, source_title, source_author, source_domain, tags)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (user_id, text.strip(), url, title, author, domain, tags_str)
-        )
-        await db.commit()
-        quote_id = cursor.lastrowid
-        logger.debug(f"Saved quote {quote_id} for user {user_id}")
-        return quote_id
+    db = await get_db()
+    cursor = await db.execute(
+        """INSERT INTO quotes (user_id, text, url, source_title, source_author,
+                               source_domain, tags, text_hash)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        (user_id, text.strip(), url, title, author, domain, tags_str, _text_hash(text))
+    )
+    quote_id = cursor.lastrowid
+    if tags:
+        await _link_tags(db, quote_id, tags)
+    _invalidate_stats(user_id)
+    logger.debug(f"Saved quote {quote_id} for user {user_id}")
+    return quote_id
 
 
 @handle_db_errors
 async def delete_quote(user_id: int, quote_id: int) -> bool:
     """Delete a quote by ID. Returns True if deleted."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "DELETE FROM quotes WHERE id = ? AND user_id = ?",
-            (quote_id, user_id)
-        )
-        await db.commit()
-        deleted = cursor.rowcount > 0
-        if deleted:
-            logger.debug(f"Deleted quote {quote_id} for user {user_id}")
-        return deleted
+    db = await get_db()
+    cursor = await db.execute(
+        "DELETE FROM quotes WHERE id = ? AND user_id = ?",
+        (quote_id, user_id)
+    )
+    deleted = cursor.rowcount > 0
+    if deleted:
+        _invalidate_stats(user_id)
+        logger.debug(f"Deleted quote {quote_id} for user {user_id}")
+    return deleted
 
 
 @handle_db_errors
 async def get_quote_by_id(user_id: int, quote_id: int) -> dict | None:
     """Get a quote by ID for a specific user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM quotes WHERE id = ? AND user_id = ?",
-            (quote_id, user_id)
-        )
-        row = await cursor.fetchone()
-        return dict(row) if row else None
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT * FROM quotes WHERE id = ? AND user_id = ?",
+        (quote_id, user_id)
+    )
+    row = await cursor.fetchone()
+    return dict(row) if row else None
+
+
+# Quotes that have never been shown come first, then ones not shown for
+# 30+/7+ days, then everything else least-shown-first; RANDOM() breaks ties
+_SPACED_REPETITION_ORDER = """
+    CASE
+        WHEN last_shown IS NULL THEN 0
+        WHEN last_shown < datetime('now', '-30 days') THEN 1
+        WHEN last_shown < datetime('now', '-7 days') THEN 2
+        ELSE 3
+    END,
+    times_shown ASC,
+    RANDOM()
+"""
 
 
 @handle_db_errors
@@ -238,99 +494,173 @@ async def get_random_quotes(user_id: int, n: int = 10, use_spaced_repetition: bo
     3. Haven't been shown in 7+ days
     4. All others, sorted by times_shown (least shown first)
     """
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-
-        if use_spaced_repetition:
-            cursor = await db.execute("""
-                SELECT * FROM quotes
-                WHERE user_id = ?
-                ORDER BY
-                    CASE
-                        WHEN last_shown IS NULL THEN 0
-                        WHEN last_shown < datetime('now', '-30 days') THEN 1
-                        WHEN last_shown < datetime('now', '-7 days') THEN 2
-                        ELSE 3
-                    END,
-                    times_shown ASC,
-                    RANDOM()
-                LIMIT ?
-            """, (user_id, n))
-        else:
-            cursor = await db.execute(
-                "SELECT * FROM quotes WHERE user_id = ? ORDER BY RANDOM() LIMIT ?",
-                (user_id, n)
-            )
+    db = await get_db()
+
+    order_by = _SPACED_REPETITION_ORDER if use_spaced_repetition else "RANDOM()"
+
+    # Pick and mark the quotes in one statement: the subquery selects the
+    # ids, the UPDATE bumps last_shown/times_shown, and RETURNING hands
+    # back the rows without a second round-trip.
+    cursor = await db.execute(f"""
+        UPDATE quotes
+        SET last_shown = CURRENT_TIMESTAMP, times_shown = times_shown + 1
+        WHERE id IN (
+            SELECT id FROM quotes
+            WHERE user_id = ?
+            ORDER BY {order_by}
+            LIMIT ?
+        )
+        RETURNING {_DIGEST_COLS}
+    """, (user_id, n))
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
+
+
+@handle_db_errors
+async def get_quote_counts(user_ids: list[int]) -> dict[int, int]:
+    """Get quote totals for many users in a single query.
+
+    Broadcast-time companion to get_quote_count: one GROUP BY instead of
+    one COUNT(*) round-trip per user. Users with no quotes are absent
+    from the result.
+    """
+    if not user_ids:
+        return {}
+
+    db = await get_db()
+    placeholders = ", ".join("?" * len(user_ids))
+    cursor = await db.execute(
+        f"SELECT user_id, COUNT(*) AS total FROM quotes "
+        f"WHERE user_id IN ({placeholders}) GROUP BY user_id",
+        user_ids
+    )
+    rows = await cursor.fetchall()
+    return {row["user_id"]: row["total"] for row in rows}
 
-        rows = await cursor.fetchall()
-        quotes = [dict(row) for row in rows]
 
-        # Update last_shown and times_shown for retrieved quotes
-        if quotes:
-            quote_ids = [q["id"] for q in quotes]
-            placeholders = ",".join("?" * len(quote_ids))
-            await db.execute(f"""
-                UPDATE quotes
-                SET last_shown = CURRENT_TIMESTAMP, times_shown = times_shown + 1
-                WHERE id IN ({placeholders})
-            """, quote_ids)
-            await db.commit()
+@handle_db_errors
+async def get_random_quotes_for_users(user_ids: list[int], n: int = 10) -> dict[int, list]:
+    """Pick and mark digest quotes for many users in one statement.
+
+    Same spaced-repetition selection as get_random_quotes, but batched:
+    ROW_NUMBER() partitioned by user keeps the top n per user, and the
+    surrounding UPDATE ... RETURNING bumps the shown counters and hands
+    the rows back, so a whole broadcast costs one round-trip instead of
+    one per user.
+    """
+    if not user_ids:
+        return {}
+
+    db = await get_db()
+    placeholders = ", ".join("?" * len(user_ids))
+    cursor = await db.execute(f"""
+        UPDATE quotes
+        SET last_shown = CURRENT_TIMESTAMP, times_shown = times_shown + 1
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY user_id
+                    ORDER BY {_SPACED_REPETITION_ORDER}
+                ) AS rn
+                FROM quotes
+                WHERE user_id IN ({placeholders})
+            )
+            WHERE rn <= ?
+        )
+        RETURNING user_id, {_DIGEST_COLS}
+    """, (*user_ids, n))
+    rows = await cursor.fetchall()
 
-        return quotes
+    quotes_by_user: dict[int, list] = {}
+    for row in rows:
+        quotes_by_user.setdefault(row["user_id"], []).append(dict(row))
+    return quotes_by_user
 
 
 @handle_db_errors
 async def get_last_quotes(user_id: int, n: int = 5) -> list:
     """Get the most recently added quotes for a user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM quotes WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
-            (user_id, n)
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    db = await get_db()
+    cursor = await db.execute(
+        f"SELECT {DISPLAY_COLS} FROM quotes WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+        (user_id, n)
+    )
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
 
 
 @handle_db_errors
 async def get_quote_count(user_id: int) -> int:
     """Get total number of quotes for a user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "SELECT COUNT(*) FROM quotes WHERE user_id = ?",
-            (user_id,)
-        )
-        row = await cursor.fetchone()
-        return row[0]
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT COUNT(*) FROM quotes WHERE user_id = ?",
+        (user_id,)
+    )
+    row = await cursor.fetchone()
+    return row[0]
+
+
+@handle_db_errors
+async def get_user_stats(user_id: int) -> dict:
+    """Get total, this-week, and favorite counts in a single query (briefly cached)."""
+    cached = _stats_cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < STATS_CACHE_TTL:
+        return dict(cached[1])
+
+    week_ago = datetime.now() - timedelta(days=7)
+    db = await get_db()
+    cursor = await db.execute(
+        """SELECT COUNT(*) AS total,
+                  SUM(CASE WHEN created_at >= ? THEN 1 ELSE 0 END) AS this_week,
+                  SUM(is_favorite) AS favorites
+           FROM quotes WHERE user_id = ?""",
+        (week_ago.isoformat(), user_id)
+    )
+    row = await cursor.fetchone()
+    stats = {
+        "total": row["total"],
+        "this_week": row["this_week"] or 0,
+        "favorites": row["favorites"] or 0,
+    }
+    _stats_cache[user_id] = (time.monotonic(), stats)
+    return dict(stats)
 
 
 @handle_db_errors
 async def get_quotes_this_week(user_id: int) -> int:
     """Get number of quotes added in the last 7 days."""
     week_ago = datetime.now() - timedelta(days=7)
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "SELECT COUNT(*) FROM quotes WHERE user_id = ? AND created_at >= ?",
-            (user_id, week_ago.isoformat())
-        )
-        row = await cursor.fetchone()
-        return row[0]
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT COUNT(*) FROM quotes WHERE user_id = ? AND created_at >= ?",
+        (user_id, week_ago.isoformat())
+    )
+    row = await cursor.fetchone()
+    return row[0]
 
 
 @handle_db_errors
 async def search_quotes(user_id: int, keyword: str) -> list:
-    """Search quotes by keyword (case-insensitive)."""
+    """Search quotes by keyword using the full-text index (case-insensitive)."""
     if not keyword or not keyword.strip():
         return []
 
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM quotes WHERE user_id = ? AND text LIKE ? ORDER BY created_at DESC LIMIT 10",
-            (user_id, f"%{keyword.strip()}%")
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    # Quote the keyword so user input can't inject FTS query syntax;
+    # the trailing * makes it a prefix match, close to the old LIKE behavior.
+    escaped = keyword.strip().replace('"', '""')
+    match_query = f'text : "{escaped}"*'
+
+    db = await get_db()
+    cursor = await db.execute(
+        f"""SELECT {_DISPLAY_COLS_Q} FROM quotes_fts f
+           JOIN quotes q ON q.id = f.rowid
+           WHERE quotes_fts MATCH ? AND q.user_id = ?
+           ORDER BY rank LIMIT 10""",
+        (match_query, user_id)
+    )
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
 
 
 @handle_db_errors
@@ -339,14 +669,17 @@ async def get_quotes_by_tag(user_id: int, tag: str) -> list:
     if not tag or not tag.strip():
         return []
 
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM quotes WHERE user_id = ? AND tags LIKE ? ORDER BY created_at DESC LIMIT 10",
-            (user_id, f"%{tag.strip()}%")
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    db = await get_db()
+    cursor = await db.execute(
+        f"""SELECT {_DISPLAY_COLS_Q} FROM quote_tags jt
+           JOIN tags t ON t.id = jt.tag_id
+           JOIN quotes q ON q.id = jt.quote_id
+           WHERE q.user_id = ? AND t.name = ?
+           ORDER BY q.created_at DESC LIMIT 10""",
+        (user_id, tag.strip())
+    )
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
 
 
 @handle_db_errors
@@ -355,71 +688,79 @@ async def get_quotes_by_source(user_id: int, domain: str) -> list:
     if not domain or not domain.strip():
         return []
 
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM quotes WHERE user_id = ? AND source_domain LIKE ? ORDER BY created_at DESC LIMIT 10",
-            (user_id, f"%{domain.strip()}%")
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+    db = await get_db()
+    cursor = await db.execute(
+        f"SELECT {DISPLAY_COLS} FROM quotes WHERE user_id = ? AND source_domain LIKE ? ORDER BY created_at DESC LIMIT 10",
+        (user_id, f"%{domain.strip()}%")
+    )
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
 
 
 @handle_db_errors
 async def toggle_favorite(user_id: int, quote_id: int) -> bool | None:
     """Toggle favorite status. Returns new status, or None if quote not found."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "SELECT is_favorite FROM quotes WHERE id = ? AND user_id = ?",
-            (quote_id, user_id)
-        )
-        row = await cursor.fetchone()
-        if not row:
-            return None
-
-        new_status = 0 if row[0] else 1
-        await db.execute(
-            "UPDATE quotes SET is_favorite = ? WHERE id = ? AND user_id = ?",
-            (new_status, quote_id, user_id)
-        )
-        await db.commit()
-        logger.debug(f"Toggled favorite for quote {quote_id}: {bool(new_status)}")
-        return bool(new_status)
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT is_favorite FROM quotes WHERE id = ? AND user_id = ?",
+        (quote_id, user_id)
+    )
+    row = await cursor.fetchone()
+    if not row:
+        return None
+
+    new_status = 0 if row[0] else 1
+    await db.execute(
+        "UPDATE quotes SET is_favorite = ? WHERE id = ? AND user_id = ?",
+        (new_status, quote_id, user_id)
+    )
+    _invalidate_stats(user_id)
+    logger.debug(f"Toggled favorite for quote {quote_id}: {bool(new_status)}")
+    return bool(new_status)
 
 
 @handle_db_errors
-async def get_favorite_quotes(user_id: int) -> list:
-    """Get all favorite quotes for a user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM quotes WHERE user_id = ? AND is_favorite = 1 ORDER BY created_at DESC",
-            (user_id,)
-        )
-        rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
+async def get_favorite_quotes(user_id: int, limit: int = None) -> list:
+    """Get favorite quotes for a user, optionally capped at limit rows."""
+    db = await get_db()
+    cursor = await db.execute(
+        f"SELECT {DISPLAY_COLS} FROM quotes WHERE user_id = ? AND is_favorite = 1 "
+        "ORDER BY created_at DESC LIMIT ?",
+        (user_id, limit if limit is not None else -1)
+    )
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
 
 
 @handle_db_errors
-async def get_top_tags(user_id: int, limit: int = 5) -> list:
-    """Get the most used tags for a user."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "SELECT tags FROM quotes WHERE user_id = ? AND tags IS NOT NULL",
-            (user_id,)
-        )
-        rows = await cursor.fetchall()
+async def get_favorite_count(user_id: int) -> int:
+    """Get the number of favorite quotes without materializing the rows."""
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT COUNT(*) FROM quotes WHERE user_id = ? AND is_favorite = 1",
+        (user_id,)
+    )
+    row = await cursor.fetchone()
+    return row[0]
 
-    tag_counts = {}
-    for row in rows:
-        if row[0]:
-            for tag in row[0].split(","):
-                tag = tag.strip()
-                if tag:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
 
-    sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
-    return sorted_tags[:limit]
+@handle_db_errors
+async def get_top_tags(user_id: int, limit: int = 5) -> list:
+    """Get the most used tags for a user as (name, count) pairs."""
+    db = await get_db()
+    cursor = await db.execute(
+        """SELECT t.name, COUNT(*) AS uses
+           FROM quote_tags jt
+           JOIN tags t ON t.id = jt.tag_id
+           JOIN quotes q ON q.id = jt.quote_id
+           WHERE q.user_id = ?
+           GROUP BY t.id
+           ORDER BY uses DESC, t.name
+           LIMIT ?""",
+        (user_id, limit)
+    )
+    rows = await cursor.fetchall()
+    return [(row["name"], row["uses"]) for row in rows]
 
 
 @handle_db_errors
@@ -429,26 +770,43 @@ async def is_duplicate(user_id: int, text: str, minutes: int = 1) -> bool:
         return False
 
     cutoff = datetime.now() - timedelta(minutes=minutes)
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        cursor = await db.execute(
-            "SELECT COUNT(*) FROM quotes WHERE user_id = ? AND text = ? AND created_at >= ?",
-            (user_id, text.strip(), cutoff.isoformat())
-        )
-        row = await cursor.fetchone()
-        return row[0] > 0
+    db = await get_db()
+    cursor = await db.execute(
+        """SELECT 1 FROM quotes
+           WHERE user_id = ? AND text_hash = ? AND created_at >= ?
+           LIMIT 1""",
+        (user_id, _text_hash(text), cutoff.isoformat())
+    )
+    row = await cursor.fetchone()
+    return row is not None
+
+
+async def stream_quotes_json(user_id: int):
+    """Stream all quotes for a user as chunks of a JSON array.
+
+    Rows are serialized one at a time while iterating the cursor, so
+    memory stays flat no matter how many quotes the user has.
+    """
+    db = await get_db()
+    cursor = await db.execute(
+        "SELECT * FROM quotes WHERE user_id = ? ORDER BY created_at DESC",
+        (user_id,)
+    )
+
+    yield b"[\n"
+    count = 0
+    async for row in cursor:
+        if count:
+            yield b",\n"
+        yield orjson.dumps(dict(row), default=str)
+        count += 1
+    yield b"\n]\n"
+
+    logger.info(f"Exported {count} quotes for user {user_id}")
 
 
 @handle_db_errors
 async def export_all_quotes(user_id: int) -> str:
     """Export all quotes for a user as JSON string."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            "SELECT * FROM quotes WHERE user_id = ? ORDER BY created_at DESC",
-            (user_id,)
-        )
-        rows = await cursor.fetchall()
-        quotes = [dict(row) for row in rows]
-
-    logger.info(f"Exported {len(quotes)} quotes for user {user_id}")
-    return json.dumps(quotes, indent=2, default=str)
+    chunks = [chunk async for chunk in stream_quotes_json(user_id)]
+    return b"".join(chunks).decode()
@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import re
+import time
 from dataclasses import dataclass
 from urllib.parse import urlparse
 
@@ -26,6 +27,14 @@ MAX_URL_LENGTH = 2048
 MAX_RETRIES = 3
 INITIAL_BACKOFF = 0.5  # seconds
 
+# Metadata cache configuration
+CACHE_TTL = 3600  # seconds
+CACHE_MAX_ENTRIES = 256
+
+# URL -> (fetched_at, metadata), so the common "send URL, then send the
+# quote" flow doesn't hit the network twice for the same page
+_metadata_cache: dict[str, tuple[float, "ArticleMetadata"]] = {}
+
 
 @dataclass
 class ArticleMetadata:
@@ -41,6 +50,28 @@ def is_valid_url(url: str) -> bool:
     return bool(URL_PATTERN.match(url))
 
 
+async def fetch_metadata_cached(url: str) -> "ArticleMetadata":
+    """
+    Fetch article metadata, reusing a recent result for the same URL.
+
+    Successful results are kept for CACHE_TTL seconds; failed fetches are
+    not cached so transient errors can be retried.
+    """
+    now = time.monotonic()
+    cached = _metadata_cache.get(url)
+    if cached and now - cached[0] < CACHE_TTL:
+        logger.debug(f"Metadata cache hit for {url[:100]}")
+        return cached[1]
+
+    metadata = await fetch_metadata(url)
+    if metadata.title or metadata.author:
+        if len(_metadata_cache) >= CACHE_MAX_ENTRIES:
+            oldest = min(_metadata_cache, key=lambda key: _metadata_cache[key][0])
+            _metadata_cache.pop(oldest)
+        _metadata_cache[url] = (now, metadata)
+    return metadata
+
+
 async def fetch_metadata(url: str, retries: int = MAX_RETRIES) -> ArticleMetadata:
     """
     Fetch article metadata from a URL.
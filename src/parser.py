@@ -20,6 +20,8 @@ class ParsedMessage:
 
 URL_PATTERN = re.compile(r'https?://\S+')
 TAG_PATTERN = re.compile(r'#(\w+)')
+WORD_PATTERN = re.compile(r'^\w+$')
+WHITESPACE_PATTERN = re.compile(r'\s+')
 
 
 class ValidationError(Exception):
@@ -55,7 +57,7 @@ def validate_tag(tag: str) -> str | None:
         return None
 
     # Only allow alphanumeric and underscore
-    if not re.match(r'^\w+$', tag):
+    if not WORD_PATTERN.match(tag):
         return None
 
     return tag
@@ -128,7 +130,7 @@ def parse_message(text: str) -> ParsedMessage:
         quote = quote[1:-1].strip()
 
     # Remove multiple spaces
-    quote = re.sub(r'\s+', ' ', quote)
+    quote = WHITESPACE_PATTERN.sub(' ', quote)
 
     # Enforce quote length limit
     if len(quote) > MAX_QUOTE_LENGTH:
@@ -1,7 +1,10 @@
+import asyncio
 import logging
+import time
+from datetime import datetime, timedelta
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from telegram import Bot
+from telegram.error import RetryAfter
 
 from config import (
     DAILY_QUOTE_ENABLED,
@@ -14,39 +17,102 @@ from src.bot import format_quote
 from src.database import (
     get_quote_count,
     get_random_quotes,
+    get_random_quotes_for_users,
     get_users_for_daily_quote,
-    get_users_for_digest,
+    iter_users_for_digest,
 )
 
 logger = logging.getLogger(__name__)
 
-scheduler = AsyncIOScheduler()
+# Keep references to the cron tasks so they aren't garbage-collected
+_scheduler_tasks: list[asyncio.Task] = []
 
+# How many sends may be in flight at once during a broadcast
+BROADCAST_CONCURRENCY = 30
 
-async def send_digest_to_user(bot: Bot, user_id: int):
-    """Send the weekly digest to a specific user."""
-    quotes = await get_random_quotes(user_id, DIGEST_COUNT)
-    total = await get_quote_count(user_id)
+# Sustained send rate, just under Telegram's 30 messages/second bot-wide
+# limit. The semaphore above caps concurrency; this caps throughput.
+MESSAGES_PER_SECOND = 29
 
+
+class _TokenBucket:
+    """Minimal asyncio token bucket allowing `rate` acquisitions per second.
+
+    Tokens refill continuously; acquire() waits until one is available.
+    Waiters queue on the lock, so sends are released in order.
+    """
+
+    def __init__(self, rate: float):
+        self._rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._tokens = min(self._rate, self._tokens + elapsed * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+_send_limiter = _TokenBucket(MESSAGES_PER_SECOND)
+
+# Telegram caps messages at 4096 characters; stay a bit under it
+DIGEST_MAX_LENGTH = 4000
+
+# Marker appended when quotes are dropped to fit the length budget
+_DIGEST_ELLIPSIS = "...\n\n"
+
+
+def build_digest_message(quotes: list, total: int) -> str:
+    """Build one user's digest text.
+
+    Pure string work with no awaits, so broadcasts can run it in worker
+    threads while sends are in flight.
+    """
     if not quotes:
-        await bot.send_message(
-            chat_id=user_id,
-            text="Your Weekly Quote Digest\n\nNo quotes saved yet. Start sending me quotes to build your collection!"
+        return (
+            "Your Weekly Quote Digest\n\n"
+            "No quotes saved yet. Start sending me quotes to build your collection!"
         )
-        return
 
-    message = "Your Weekly Quote Digest\n\n"
+    parts = ["Your Weekly Quote Digest\n\n"]
+    footer = f"Total saved: {total} quotes"
+    append = parts.append  # avoid re-resolving the bound method per quote
 
+    # Track the running length and stop before the limit instead of
+    # building an oversized string and slicing most of it away
+    length = len(parts[0]) + len(footer)
     for i, quote in enumerate(quotes, 1):
-        message += f"{i}. {format_quote(quote)}\n\n"
+        part = f"{i}. {format_quote(quote)}\n\n"
+        if length + len(part) > DIGEST_MAX_LENGTH - len(_DIGEST_ELLIPSIS):
+            append(_DIGEST_ELLIPSIS)
+            break
+        append(part)
+        length += len(part)
 
-    message += f"Total saved: {total} quotes"
+    parts.append(footer)
+    return "".join(parts)
 
-    # Telegram has a 4096 character limit
-    if len(message) > 4000:
-        message = message[:3997] + "..."
 
-    await bot.send_message(chat_id=user_id, text=message)
+async def send_digest_to_user(bot: Bot, user_id: int, quotes: list = None, total: int = None):
+    """Send the weekly digest to a specific user.
+
+    Broadcasts pass preloaded quotes/total from the batch queries; the
+    /digest command calls with just the user id and fetches here.
+    """
+    if quotes is None:
+        quotes = await get_random_quotes(user_id, DIGEST_COUNT)
+    if total is None:
+        total = await get_quote_count(user_id)
+
+    await bot.send_message(chat_id=user_id, text=build_digest_message(quotes, total))
 
 
 async def send_daily_quote_to_user(bot: Bot, user_id: int):
@@ -62,60 +128,134 @@ async def send_daily_quote_to_user(bot: Bot, user_id: int):
     await bot.send_message(chat_id=user_id, text=message)
 
 
+async def _fan_out(send_one, users, what: str):
+    """Run send_one over all users concurrently, bounded by a semaphore.
+
+    Each send catches its own exceptions so one failing chat can't cancel
+    the rest of the broadcast.
+    """
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+    async def _send(user):
+        async with semaphore:
+            try:
+                await _send_limiter.acquire()
+                await send_one(user["chat_id"])
+            except RetryAfter as e:
+                # Telegram told us to back off; honor it and retry once
+                logger.warning("Rate limited sending %s, retrying in %ss", what, e.retry_after)
+                await asyncio.sleep(e.retry_after)
+                try:
+                    await _send_limiter.acquire()
+                    await send_one(user["chat_id"])
+                except Exception as e2:
+                    logger.error("Failed to send %s to user %s: %s", what, user["chat_id"], e2)
+            except Exception as e:
+                logger.error("Failed to send %s to user %s: %s", what, user["chat_id"], e)
+
+    await asyncio.gather(*(_send(user) for user in users))
+
+
 async def send_digest_to_all(bot: Bot):
     """Send the weekly digest to all users who have it enabled."""
-    users = await get_users_for_digest()
-    logger.info(f"Sending weekly digest to {len(users)} users")
+    sent = 0
 
-    for user in users:
-        try:
-            await send_digest_to_user(bot, user["chat_id"])
-        except Exception as e:
-            logger.error(f"Failed to send digest to user {user['chat_id']}: {e}")
+    # Users arrive in keyset-paginated batches; each batch is prepared
+    # and sent while the next one is still cheap to fetch, keeping peak
+    # memory at one batch instead of the whole user list
+    async for users in iter_users_for_digest():
+        # Totals come straight off the user rows (trigger-maintained
+        # counter), so picking the quotes is the only extra query
+        user_ids = [user["chat_id"] for user in users]
+        counts = {user["chat_id"]: user["quote_count"] for user in users}
+        quotes_by_user = await get_random_quotes_for_users(user_ids, DIGEST_COUNT)
+
+        # Formatting is pure CPU; build every body in worker threads so
+        # the event loop stays free for the sends that follow
+        bodies = await asyncio.gather(*(
+            asyncio.to_thread(
+                build_digest_message, quotes_by_user.get(uid, []), counts.get(uid, 0)
+            )
+            for uid in user_ids
+        ))
+        text_by_user = dict(zip(user_ids, bodies, strict=True))
+
+        # Bind the method once; the lambda runs per recipient
+        await _fan_out(
+            lambda chat_id, send=bot.send_message, texts=text_by_user: send(
+                chat_id=chat_id, text=texts[chat_id]
+            ),
+            users,
+            "digest",
+        )
+        sent += len(users)
+
+    logger.info("Sent weekly digest to %d users", sent)
 
 
 async def send_daily_quote_to_all(bot: Bot):
     """Send the daily quote to all users who have it enabled."""
     users = await get_users_for_daily_quote()
-    logger.info(f"Sending daily quote to {len(users)} users")
+    logger.info("Sending daily quote to %d users", len(users))
+
+    await _fan_out(lambda chat_id: send_daily_quote_to_user(bot, chat_id), users, "daily quote")
+
 
-    for user in users:
+def seconds_until_next(schedule: dict) -> float:
+    """Compute seconds until the next fire time for a schedule dict.
+
+    With a "day_of_week" key (0=Monday, matching config.DAY_MAP) the
+    schedule fires weekly at hour:minute; without it, daily.
+    """
+    now = datetime.now()
+    target = now.replace(
+        hour=schedule["hour"], minute=schedule["minute"], second=0, microsecond=0
+    )
+
+    if "day_of_week" in schedule:
+        target += timedelta(days=(schedule["day_of_week"] - now.weekday()) % 7)
+        if target <= now:
+            target += timedelta(days=7)
+    elif target <= now:
+        target += timedelta(days=1)
+
+    return (target - now).total_seconds()
+
+
+async def _cron_loop(job, bot: Bot, schedule: dict, name: str):
+    """Minimal cron: sleep until the next fire time, run the job, repeat.
+
+    At most one instance of a job ever runs: the next sleep only starts
+    after the previous run returns, and fire times that pass while the
+    process is down or a run overruns are skipped, never replayed - so a
+    restart can't trigger back-to-back catch-up broadcasts (what
+    coalesce/misfire_grace_time/max_instances guard against elsewhere).
+    """
+    while True:
+        # The extra second keeps a sub-second run from re-matching the
+        # same fire minute and broadcasting twice
+        await asyncio.sleep(seconds_until_next(schedule) + 1)
         try:
-            await send_daily_quote_to_user(bot, user["chat_id"])
+            await job(bot)
         except Exception as e:
-            logger.error(f"Failed to send daily quote to user {user['chat_id']}: {e}")
+            logger.error("Scheduled %s run failed: %s", name, e)
 
 
 def setup_scheduler(bot: Bot):
-    """Set up the scheduled jobs."""
+    """Set up the scheduled jobs as asyncio tasks on the running loop."""
 
     # Weekly digest
     if DIGEST_ENABLED:
         schedule = get_digest_schedule()
-        scheduler.add_job(
-            send_digest_to_all,
-            trigger="cron",
-            day_of_week=schedule["day_of_week"],
-            hour=schedule["hour"],
-            minute=schedule["minute"],
-            args=[bot],
-            id="weekly_digest",
-            replace_existing=True,
-        )
-        logger.info(f"Weekly digest scheduled for day {schedule['day_of_week']} at {schedule['hour']}:{schedule['minute']}")
+        _scheduler_tasks.append(asyncio.create_task(
+            _cron_loop(send_digest_to_all, bot, schedule, "weekly digest")
+        ))
+        logger.info("Weekly digest scheduled for day %s at %s:%s", schedule["day_of_week"], schedule["hour"], schedule["minute"])
 
     # Daily quote of the day
     if DAILY_QUOTE_ENABLED:
         daily_schedule = get_daily_quote_schedule()
-        scheduler.add_job(
-            send_daily_quote_to_all,
-            trigger="cron",
-            hour=daily_schedule["hour"],
-            minute=daily_schedule["minute"],
-            args=[bot],
-            id="daily_quote",
-            replace_existing=True,
-        )
-        logger.info(f"Daily quote scheduled at {daily_schedule['hour']}:{daily_schedule['minute']}")
-
-    scheduler.start()
+        _scheduler_tasks.append(asyncio.create_task(
+            _cron_loop(send_daily_quote_to_all, bot, daily_schedule, "daily quote")
+        ))
+        logger.info("Daily quote scheduled at %s:%s", daily_schedule["hour"], daily_schedule["minute"])
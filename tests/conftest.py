@@ -30,11 +30,17 @@ async def test_db(tmp_path, monkeypatch):
     monkeypatch.setattr(database, "DATABASE_PATH", test_db_path)
     monkeypatch.setattr(database, "DATA_DIR", test_data_dir)
 
+    # Make sure no shared connection from a previous test points at an old path
+    await database.close_db()
+
     # Initialize the database
     await database.init_db()
 
     yield test_db_path
 
+    # Close the shared connection so the next test gets a fresh one
+    await database.close_db()
+
 
 @pytest.fixture
 def sample_quotes():
@@ -141,6 +141,18 @@ class TestFormatQuote:
         assert "#wisdom" in result
         assert "#inspiration" in result
 
+    def test_repeat_render_hits_cache(self):
+        """Test that rendering the same quote twice reuses the cached body."""
+        from src.bot import _format_quote_body
+
+        _format_quote_body.cache_clear()
+        quote = {"id": 7, "text": "Cached quote", "tags": "wisdom"}
+        first = format_quote(quote)
+        second = format_quote(quote)
+
+        assert first == second
+        assert _format_quote_body.cache_info().hits == 1
+
     def test_quote_with_timestamp(self):
         """Test formatting with timestamp."""
         timestamp = (datetime.now() - timedelta(days=2)).isoformat()
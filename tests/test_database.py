@@ -52,6 +52,36 @@ class TestDatabaseInit:
                     "source_domain", "tags", "is_favorite", "times_shown", "last_shown", "created_at"}
         assert expected.issubset(columns)
 
+    @pytest.mark.asyncio
+    async def test_init_creates_composite_indexes(self, test_db):
+        """Test that init_db creates the composite indexes for user-scoped queries."""
+        import aiosqlite
+
+        async with aiosqlite.connect(test_db) as db:
+            cursor = await db.execute(
+                "SELECT name FROM sqlite_master WHERE type='index'"
+            )
+            indexes = {row[0] for row in await cursor.fetchall()}
+
+        assert "idx_quotes_user_created" in indexes
+        assert "idx_quotes_user_fav" in indexes
+        assert "idx_quotes_user_domain" in indexes
+        assert "idx_quotes_user_lastshown" in indexes
+
+    @pytest.mark.asyncio
+    async def test_init_creates_broadcast_indexes(self, test_db):
+        """Test that init_db creates the partial indexes for broadcast lookups."""
+        import aiosqlite
+
+        async with aiosqlite.connect(test_db) as db:
+            cursor = await db.execute(
+                "SELECT name FROM sqlite_master WHERE type='index'"
+            )
+            indexes = {row[0] for row in await cursor.fetchall()}
+
+        assert "idx_users_digest_enabled" in indexes
+        assert "idx_users_daily_quote_enabled" in indexes
+
 
 class TestUserFunctions:
     """Test cases for user-related database functions."""
@@ -71,6 +101,18 @@ class TestUserFunctions:
 
         assert is_new is False
 
+        users = await database.get_all_users()
+        assert users[0]["username"] == "newname"
+
+    @pytest.mark.asyncio
+    async def test_register_unchanged_user_short_circuits(self, test_db):
+        """Test that re-registering an unchanged user skips the database."""
+        await database.register_user(123456, "samename", "Same")
+        is_new = await database.register_user(123456, "samename", "Same")
+
+        assert is_new is False
+        assert database._seen_users[123456] == ("samename", "Same")
+
     @pytest.mark.asyncio
     async def test_get_all_users(self, test_db):
         """Test retrieving all users."""
@@ -94,6 +136,20 @@ class TestUserFunctions:
         assert len(users) == 1
         assert users[0]["chat_id"] == 111
 
+    @pytest.mark.asyncio
+    async def test_iter_users_for_digest_batches(self, test_db):
+        """Test that users are yielded in batches covering everyone once."""
+        for i in range(5):
+            await database.register_user(1000 + i, f"user{i}", "User")
+
+        batches = []
+        async for batch in database.iter_users_for_digest(batch_size=2):
+            batches.append(batch)
+
+        assert [len(b) for b in batches] == [2, 2, 1]
+        chat_ids = {u["chat_id"] for batch in batches for u in batch}
+        assert chat_ids == {1000, 1001, 1002, 1003, 1004}
+
     @pytest.mark.asyncio
     async def test_get_users_for_daily_quote(self, test_db):
         """Test getting users with daily quote enabled."""
@@ -192,6 +248,56 @@ class TestQuoteFunctions:
 
         assert count == 3
 
+    @pytest.mark.asyncio
+    async def test_quote_count_counter_tracks_changes(self, test_db):
+        """Test that the denormalized users.quote_count follows saves and deletes."""
+        await database.register_user(123, "user", "User")
+        quote_id = await database.save_quote(user_id=123, text="Quote 1")
+        await database.save_quote(user_id=123, text="Quote 2")
+
+        users = await database.get_users_for_digest()
+        assert users[0]["quote_count"] == 2
+
+        await database.delete_quote(123, quote_id)
+        users = await database.get_users_for_digest()
+        assert users[0]["quote_count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_get_user_stats(self, test_db):
+        """Test the single-query stats aggregate."""
+        await database.register_user(123, "user", "User")
+        id1 = await database.save_quote(user_id=123, text="Quote 1")
+        await database.save_quote(user_id=123, text="Quote 2")
+        await database.toggle_favorite(123, id1)
+
+        stats = await database.get_user_stats(123)
+
+        assert stats["total"] == 2
+        assert stats["this_week"] == 2
+        assert stats["favorites"] == 1
+
+    @pytest.mark.asyncio
+    async def test_get_user_stats_empty(self, test_db):
+        """Test stats for a user with no quotes."""
+        await database.register_user(123, "user", "User")
+
+        stats = await database.get_user_stats(123)
+
+        assert stats == {"total": 0, "this_week": 0, "favorites": 0}
+
+    @pytest.mark.asyncio
+    async def test_get_user_stats_cache_invalidated_on_save(self, test_db):
+        """Test that saving a quote refreshes the cached stats."""
+        await database.register_user(123, "user", "User")
+        await database.save_quote(user_id=123, text="Quote 1")
+
+        first = await database.get_user_stats(123)
+        await database.save_quote(user_id=123, text="Quote 2")
+        second = await database.get_user_stats(123)
+
+        assert first["total"] == 1
+        assert second["total"] == 2
+
     @pytest.mark.asyncio
     async def test_get_last_quotes(self, test_db):
         """Test getting most recent quotes."""
@@ -228,6 +334,28 @@ class TestQuoteFunctions:
 
         assert len(results) == 1
 
+    @pytest.mark.asyncio
+    async def test_search_quotes_other_user(self, test_db):
+        """Test that search only returns the requesting user's quotes."""
+        await database.register_user(123, "user1", "User1")
+        await database.register_user(456, "user2", "User2")
+        await database.save_quote(user_id=123, text="Shared keyword here")
+
+        results = await database.search_quotes(456, "keyword")
+
+        assert results == []
+
+    @pytest.mark.asyncio
+    async def test_search_quotes_deleted_quote_not_found(self, test_db):
+        """Test that deleted quotes drop out of the search index."""
+        await database.register_user(123, "user", "User")
+        quote_id = await database.save_quote(user_id=123, text="Ephemeral wisdom")
+        await database.delete_quote(123, quote_id)
+
+        results = await database.search_quotes(123, "ephemeral")
+
+        assert results == []
+
 
 class TestTagFunctions:
     """Test cases for tag-related functionality."""
@@ -244,6 +372,29 @@ class TestTagFunctions:
 
         assert len(results) == 2
 
+    @pytest.mark.asyncio
+    async def test_get_quotes_by_tag_exact_name(self, test_db):
+        """Test that tag lookup matches whole tag names, not substrings."""
+        await database.register_user(123, "user", "User")
+        await database.save_quote(user_id=123, text="Quote 1", tags=["wisdom"])
+        await database.save_quote(user_id=123, text="Quote 2", tags=["wis"])
+
+        results = await database.get_quotes_by_tag(123, "wis")
+
+        assert len(results) == 1
+        assert results[0]["text"] == "Quote 2"
+
+    @pytest.mark.asyncio
+    async def test_get_quotes_by_tag_after_delete(self, test_db):
+        """Test that deleting a quote removes its tag links."""
+        await database.register_user(123, "user", "User")
+        quote_id = await database.save_quote(user_id=123, text="Quote", tags=["gone"])
+        await database.delete_quote(123, quote_id)
+
+        results = await database.get_quotes_by_tag(123, "gone")
+
+        assert results == []
+
     @pytest.mark.asyncio
     async def test_get_top_tags(self, test_db):
         """Test getting most used tags."""
@@ -308,6 +459,30 @@ class TestFavoriteFunctions:
 
         assert len(favorites) == 2
 
+    @pytest.mark.asyncio
+    async def test_get_favorite_quotes_limit(self, test_db):
+        """Test capping the number of favorites returned."""
+        await database.register_user(123, "user", "User")
+        for i in range(3):
+            quote_id = await database.save_quote(user_id=123, text=f"Quote {i}")
+            await database.toggle_favorite(123, quote_id)
+
+        favorites = await database.get_favorite_quotes(123, limit=2)
+
+        assert len(favorites) == 2
+
+    @pytest.mark.asyncio
+    async def test_get_favorite_count(self, test_db):
+        """Test counting favorites without fetching them."""
+        await database.register_user(123, "user", "User")
+        quote_id = await database.save_quote(user_id=123, text="Quote 1")
+        await database.save_quote(user_id=123, text="Quote 2")
+        await database.toggle_favorite(123, quote_id)
+
+        count = await database.get_favorite_count(123)
+
+        assert count == 1
+
 
 class TestDuplicateDetection:
     """Test cases for duplicate detection."""
@@ -377,6 +552,18 @@ class TestExport:
 
         assert data == []
 
+    @pytest.mark.asyncio
+    async def test_stream_quotes_json(self, test_db):
+        """Test that the streamed chunks assemble into valid JSON."""
+        await database.register_user(123, "user", "User")
+        await database.save_quote(user_id=123, text="Streamed quote")
+
+        chunks = [chunk async for chunk in database.stream_quotes_json(123)]
+        data = json.loads(b"".join(chunks))
+
+        assert len(data) == 1
+        assert data[0]["text"] == "Streamed quote"
+
 
 class TestRandomQuotes:
     """Test cases for random quote selection."""
@@ -413,3 +600,66 @@ class TestRandomQuotes:
         quotes = await database.get_random_quotes(123, n=10)
 
         assert len(quotes) == 1
+
+    @pytest.mark.asyncio
+    async def test_get_random_quotes_truncates_long_text(self, test_db):
+        """Test that essay-length text is capped at the digest limit in SQL."""
+        await database.register_user(123, "user", "User")
+        await database.save_quote(user_id=123, text="x" * 2000)
+
+        quotes = await database.get_random_quotes(123, n=1)
+
+        assert len(quotes[0]["text"]) == database.DIGEST_TEXT_LIMIT + 3
+        assert quotes[0]["text"].endswith("...")
+
+
+class TestBatchDigestQueries:
+    """Test cases for the batched broadcast queries."""
+
+    @pytest.mark.asyncio
+    async def test_get_quote_counts(self, test_db):
+        """Test counting quotes for several users at once."""
+        await database.register_user(123, "user1", "User")
+        await database.register_user(456, "user2", "User")
+        for i in range(3):
+            await database.save_quote(user_id=123, text=f"Quote {i}")
+        await database.save_quote(user_id=456, text="Other quote")
+
+        counts = await database.get_quote_counts([123, 456, 789])
+
+        assert counts[123] == 3
+        assert counts[456] == 1
+        assert 789 not in counts
+
+    @pytest.mark.asyncio
+    async def test_get_quote_counts_empty(self, test_db):
+        """Test that an empty user list returns an empty dict."""
+        counts = await database.get_quote_counts([])
+
+        assert counts == {}
+
+    @pytest.mark.asyncio
+    async def test_get_random_quotes_for_users(self, test_db):
+        """Test picking quotes for several users in one call."""
+        await database.register_user(123, "user1", "User")
+        await database.register_user(456, "user2", "User")
+        for i in range(5):
+            await database.save_quote(user_id=123, text=f"Quote {i}")
+        await database.save_quote(user_id=456, text="Other quote")
+
+        quotes_by_user = await database.get_random_quotes_for_users([123, 456], n=3)
+
+        assert len(quotes_by_user[123]) == 3
+        assert len(quotes_by_user[456]) == 1
+
+    @pytest.mark.asyncio
+    async def test_get_random_quotes_for_users_updates_shown(self, test_db):
+        """Test that the batch pick bumps times_shown like the single one."""
+        await database.register_user(123, "user", "User")
+        quote_id = await database.save_quote(user_id=123, text="Test quote")
+
+        await database.get_random_quotes_for_users([123], n=1)
+        quote = await database.get_quote_by_id(123, quote_id)
+
+        assert quote["times_shown"] == 1
+        assert quote["last_shown"] is not None
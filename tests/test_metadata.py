@@ -10,6 +10,7 @@ from src.metadata import (
     _extract_author,
     _extract_title,
     fetch_metadata,
+    fetch_metadata_cached,
 )
 
 
@@ -272,3 +273,42 @@ class TestFetchMetadata:
             result = await fetch_metadata("https://example.com")
 
             assert isinstance(result, ArticleMetadata)
+
+
+class TestFetchMetadataCached:
+    """Test cases for the TTL-cached fetch_metadata wrapper."""
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        """Start each test with an empty metadata cache."""
+        from src import metadata
+
+        metadata._metadata_cache.clear()
+        yield
+        metadata._metadata_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_second_call_hits_cache(self):
+        """Test that a repeated URL is served from the cache."""
+        mock_fetch = AsyncMock(
+            return_value=ArticleMetadata(title="Cached", author=None, domain="example.com")
+        )
+        with patch("src.metadata.fetch_metadata", mock_fetch):
+            first = await fetch_metadata_cached("https://example.com/cached")
+            second = await fetch_metadata_cached("https://example.com/cached")
+
+        assert mock_fetch.await_count == 1
+        assert first.title == "Cached"
+        assert second.title == "Cached"
+
+    @pytest.mark.asyncio
+    async def test_failed_fetch_not_cached(self):
+        """Test that empty results are refetched on the next call."""
+        mock_fetch = AsyncMock(
+            return_value=ArticleMetadata(title=None, author=None, domain="example.com")
+        )
+        with patch("src.metadata.fetch_metadata", mock_fetch):
+            await fetch_metadata_cached("https://example.com/failed")
+            await fetch_metadata_cached("https://example.com/failed")
+
+        assert mock_fetch.await_count == 2